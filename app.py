@@ -1,17 +1,73 @@
 import os
+import copy
 import json
+import hashlib
 import requests
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import google.generativeai as genai
 from dotenv import load_dotenv
 import re
 import time
+import queue
+import threading
+from collections import Counter, OrderedDict
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from secrets import token_hex
 from typing import Dict, List, Any, Optional
 import logging
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+# orjson is a much faster C JSON implementation; fall back to the stdlib
+# when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# flashtext finds all vocabulary keywords in one Aho-Corasick pass; fall
+# back to the generic regex tokenizer when it is not installed
+try:
+    from flashtext import KeywordProcessor
+except ImportError:
+    KeywordProcessor = None
+
+def json_dumps(obj, indent=False):
+    """Serialize an object to a JSON string"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+    return json.dumps(obj, indent=2 if indent else None)
+
+def json_loads(data):
+    """Deserialize a JSON string or bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# googleapiclient deserializes every API response with stdlib json; the
+# videos.list payloads run to tens of KB, so point its model module at
+# orjson when available. A shim keeps the stdlib call signatures since
+# orjson.dumps returns bytes and takes no keyword arguments.
+if orjson is not None:
+    try:
+        from googleapiclient import model as _gapi_model
+
+        class _OrjsonShim:
+            @staticmethod
+            def loads(data, *args, **kwargs):
+                return orjson.loads(data)
+
+            @staticmethod
+            def dumps(obj, *args, **kwargs):
+                return orjson.dumps(obj).decode()
+
+        _gapi_model.json = _OrjsonShim
+    except ImportError:
+        pass
+
 # Load environment variables
 load_dotenv()
 
@@ -28,97 +84,441 @@ console_handler = logging.StreamHandler()
 logger.addHandler(console_handler)
 
 # Flow tracking variables
-flow_steps = {}
+# Bounded LRU: every request mints a fresh session id, so without eviction
+# this dict grows for the life of the process
+flow_steps = OrderedDict()
+MAX_FLOW_SESSIONS = 10000
+_flow_lock = threading.Lock()
 GLOBAL_TOOL_SESSION = "tool_exec"  # Default session ID for direct tool execution
 
+# ANSI color per step type; BLUE (query) is the default
+_STEP_COLORS = {
+    "LLM": '\033[92m',     # Green
+    "TOOL": '\033[93m',    # Yellow
+    "RESULT": '\033[96m',  # Cyan
+    "ERROR": '\033[91m',   # Red
+}
+_COLOR_BLUE = '\033[94m'
+_COLOR_RESET = '\033[0m'
+
+# Flow log entries are handed to a bounded queue and written by a single
+# daemon thread, so request threads never block on log I/O; entries are
+# dropped (rather than blocking) if the consumer falls behind
+_FLOW_LOG_QUEUE = queue.Queue(maxsize=10000)
+
+def _drain_flow_log():
+    while True:
+        session_id, formatted_step, message = _FLOW_LOG_QUEUE.get()
+        if message:
+            logger.info("[%s] %s → %.100s%s", session_id, formatted_step, message,
+                        '...' if len(message) > 100 else '')
+        else:
+            logger.info("[%s] %s", session_id, formatted_step)
+
+threading.Thread(target=_drain_flow_log, daemon=True).start()
+
+def _reset_flow(session_id):
+    """Reset a session's step counter; shares the lock with log_flow_step"""
+    with _flow_lock:
+        flow_steps[session_id] = 1
+        flow_steps.move_to_end(session_id)
+        while len(flow_steps) > MAX_FLOW_SESSIONS:
+            flow_steps.popitem(last=False)
+
 def log_flow_step(session_id, step_type, message=""):
     """Log a step in the flow with minimal formatting"""
-    if session_id not in flow_steps:
-        flow_steps[session_id] = 1
-    
-    step_num = flow_steps[session_id]
-    
-    # Color codes
-    BLUE = '\033[94m'    # Query
-    GREEN = '\033[92m'   # LLM
-    YELLOW = '\033[93m'  # Tool
-    CYAN = '\033[96m'    # Result
-    RED = '\033[91m'     # Error
-    RESET = '\033[0m'    # Reset
-    
-    color = BLUE
-    if step_type == "LLM":
-        color = GREEN
-    elif step_type == "TOOL":
-        color = YELLOW
-    elif step_type == "RESULT":
-        color = CYAN
-    elif step_type == "ERROR":
-        color = RED
-    
+    # This runs several times per tool execution; skip all formatting
+    # when INFO logs are filtered out anyway
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
+    with _flow_lock:
+        step_num = flow_steps.setdefault(session_id, 1)
+        flow_steps.move_to_end(session_id)
+        # Increment step counter if this is the start of a new sequence
+        if step_type == "QUERY":
+            flow_steps[session_id] += 1
+        while len(flow_steps) > MAX_FLOW_SESSIONS:
+            flow_steps.popitem(last=False)
+
+    color = _STEP_COLORS.get(step_type, _COLOR_BLUE)
+
     # Format the step in the pattern: Query1→LLM→Tool→Result
-    formatted_step = f"{color}{step_type}{step_num}{RESET}"
-    
-    # Increment step counter if this is the start of a new sequence
-    if step_type == "QUERY":
-        flow_steps[session_id] += 1
-    
-    # Log the formatted message
-    if message:
-        logger.info(f"[{session_id}] {formatted_step} → {message[:100]}{'...' if len(message) > 100 else ''}")
-    else:
-        logger.info(f"[{session_id}] {formatted_step}")
+    formatted_step = f"{color}{step_type}{step_num}{_COLOR_RESET}"
+
+    try:
+        _FLOW_LOG_QUEUE.put_nowait((session_id, formatted_step, message))
+    except queue.Full:
+        pass
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+# Reject oversized request bodies (e.g. a huge video_data blob) with 413
+# before they are parsed; the extension's payloads are a few KB at most
+app.config["MAX_CONTENT_LENGTH"] = 1_000_000
+
+# Serve and parse request/response JSON through orjson when available
+if orjson is not None:
+    from flask.json.provider import JSONProvider
+
+    class ORJSONProvider(JSONProvider):
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = ORJSONProvider(app)
+
+# Compress JSON responses when flask-compress is installed; trending
+# payloads are highly redundant JSON that gzips 6-10x, which dominates
+# transfer time for extension users on mobile links
+try:
+    from flask_compress import Compress
+    app.config["COMPRESS_MIN_SIZE"] = 1024
+    Compress(app)
+except ImportError:
+    pass
 
 # Get API keys from environment variables
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "your-api-key-here")
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY", "your-youtube-api-key-here")
 
 # Initialize Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
+# The gRPC transport keeps one HTTP/2 channel open across calls, so each
+# generation reuses the TLS session instead of handshaking again
+genai.configure(api_key=GEMINI_API_KEY, transport="grpc")
+
+# Shared Gemini model instance; constructing one runs config and transport
+# setup, so build it once at import instead of per call
+GEMINI_MODEL = genai.GenerativeModel('gemini-2.0-flash')
 
 # Initialize YouTube API client
+# Built once per thread: discovery-document parsing is expensive and the
+# client keeps its HTTP connection alive, but googleapiclient's transport
+# is not safe to share across threads, hence thread-local rather than a
+# single module global.
+_youtube_local = threading.local()
+
 def get_youtube_client():
-    return build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
+    client = getattr(_youtube_local, "client", None)
+    if client is None:
+        client = _youtube_local.client = build(
+            'youtube', 'v3',
+            developerKey=YOUTUBE_API_KEY,
+            cache_discovery=False,
+            static_discovery=True  # Use the bundled discovery doc, no extra fetch
+        )
+    return client
+
+def fetch_videos_batched(video_ids, parts="snippet,statistics,contentDetails"):
+    """
+    Fetch video resources for a list of IDs
+
+    Dedupes the IDs (preserving order) and chunks them to the API's 50-id
+    cap per videos.list call; multiple chunks are fetched concurrently.
+    Returns the flattened item list.
+    """
+    unique_ids = list(dict.fromkeys(video_ids))
+    chunks = [unique_ids[i:i + 50] for i in range(0, len(unique_ids), 50)]
+    if not chunks:
+        return []
+
+    def fetch(chunk):
+        return get_youtube_client().videos().list(
+            part=parts,
+            id=",".join(chunk)
+        ).execute().get('items', [])
+
+    if len(chunks) == 1:
+        return fetch(chunks[0])
+    items = []
+    with ThreadPoolExecutor(max_workers=min(len(chunks), 4)) as pool:
+        for chunk_items in pool.map(fetch, chunks):
+            items.extend(chunk_items)
+    return items
+
+# Conversation history store
+# Use Redis when it is available so history survives restarts and can be
+# shared across multiple workers; fall back to an in-process dict otherwise.
+HISTORY_TTL = 3600  # Seconds before an idle conversation expires
+
+try:
+    import redis
+    redis_client = redis.Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", "6379")),
+        decode_responses=True,
+        socket_connect_timeout=0.5
+    )
+    redis_client.ping()
+    logger.info("Using Redis for conversation history")
+except Exception:
+    redis_client = None
+
+# In-process fallback store when Redis is not running, bounded so a
+# long-running process cannot leak memory
+conversation_history = OrderedDict()
+MAX_CONVERSATIONS = 1000  # LRU cap on tracked conversations
+MAX_TURNS = 12            # Last 6 exchanges; oldest turns drop past this
+# Guards the fallback dict; with the threaded server two requests can
+# append/evict concurrently. Redis does its own locking server-side.
+_history_lock = threading.Lock()
+
+def _history_key(conversation_id):
+    return f"conv:{conversation_id}"
 
-# Store conversation history for each session
-conversation_history = {}
+def append_history(conversation_id, message):
+    """Append a message to a conversation's history"""
+    if redis_client is not None:
+        key = _history_key(conversation_id)
+        # One pipelined round trip: append, cap to the newest MAX_TURNS
+        # server-side, refresh the idle expiry
+        pipe = redis_client.pipeline()
+        pipe.rpush(key, json_dumps(message))
+        pipe.ltrim(key, -MAX_TURNS, -1)
+        pipe.expire(key, HISTORY_TTL)
+        pipe.execute()
+    else:
+        with _history_lock:
+            history = conversation_history.get(conversation_id)
+            if history is None:
+                history = conversation_history[conversation_id] = []
+            conversation_history.move_to_end(conversation_id)
+            history.append(message)
+            # Trim in occasional resets rather than on every append: between
+            # resets the turn list only grows at the tail, so each rebuilt
+            # prompt is a byte-identical extension of the previous one and
+            # server-side prefix caches can hit across chained agent calls
+            if len(history) > MAX_TURNS:
+                del history[:-MAX_TURNS // 2]
+            while len(conversation_history) > MAX_CONVERSATIONS:
+                conversation_history.popitem(last=False)
+
+def get_history(conversation_id):
+    """Return the list of messages for a conversation"""
+    if redis_client is not None:
+        entries = redis_client.lrange(_history_key(conversation_id), 0, -1)
+        return [json_loads(entry) for entry in entries]
+    with _history_lock:
+        return list(conversation_history.get(conversation_id, []))
+
+# The in-process fallback caches (used when Redis is unavailable) all
+# store key -> (timestamp, value) and share one eviction rule: at the
+# cap, drop the oldest entry. The scan only runs once a cache is full.
+# Writes share one lock so the eviction scan can't race a concurrent
+# insert resizing the dict mid-iteration.
+MAX_FALLBACK_CACHE_ENTRIES = 1024
+_fallback_cache_lock = threading.Lock()
+
+def _fallback_cache_put(cache, key, value, max_entries=MAX_FALLBACK_CACHE_ENTRIES):
+    with _fallback_cache_lock:
+        if len(cache) >= max_entries:
+            oldest = min(cache, key=lambda k: cache[k][0])
+            del cache[oldest]
+        cache[key] = (time.time(), value)
+
+# Gemini response cache
+# Repeated first-turn prompts (same niche, same video URL) are served from
+# cache instead of paying a multi-second LLM round trip.
+GEMINI_CACHE_TTL = 3600
+
+# In-process fallback cache: key -> (timestamp, result)
+_gemini_response_cache = {}
+
+def _gemini_cache_key(prompt, tool_results, system_prompt=None):
+    if orjson is not None:
+        payload = orjson.dumps(tool_results or {}, option=orjson.OPT_SORT_KEYS)
+    else:
+        payload = json.dumps(tool_results or {}, sort_keys=True).encode()
+    digest = hashlib.sha256((system_prompt or "").encode() + prompt.encode() + payload).hexdigest()
+    return f"gemini:{digest}"
+
+def _gemini_cache_get(key):
+    if redis_client is not None:
+        cached = redis_client.get(key)
+        return json_loads(cached) if cached else None
+    entry = _gemini_response_cache.get(key)
+    if entry and time.time() - entry[0] < GEMINI_CACHE_TTL:
+        return entry[1]
+    return None
+
+def _gemini_cache_set(key, result):
+    if redis_client is not None:
+        redis_client.setex(key, GEMINI_CACHE_TTL, json_dumps(result))
+    else:
+        _fallback_cache_put(_gemini_response_cache, key, result)
 
 # Root endpoint for health check
+# Health probe state
+# The YouTube API test costs quota and a ~200ms round trip, so it runs in
+# the background at most once per TTL; the endpoint serves the last-known
+# result immediately.
+HEALTH_PROBE_TTL = 60
+_health_state = {"working": False, "checked_at": 0.0}
+_health_refreshing = threading.Lock()
+
+def _refresh_health():
+    """Probe the YouTube API and record whether it responds"""
+    working = False
+    try:
+        # Try a simple search query
+        response = get_youtube_client().videos().list(
+            part="snippet",
+            chart="mostPopular",
+            maxResults=1
+        ).execute()
+        if response and "items" in response:
+            working = True
+    except Exception as e:
+        logger.error("YouTube API test failed: %s", e)
+    _health_state["working"] = working
+    _health_state["checked_at"] = time.monotonic()
+    _health_refreshing.release()
+
 @app.route('/', methods=['GET'])
 def health_check():
     """
     Simple health check endpoint to confirm the API is running
     """
     youtube_api_configured = bool(YOUTUBE_API_KEY and YOUTUBE_API_KEY != "your-youtube-api-key-here")
-    youtube_api_working = False
-    
-    # Test YouTube API connection if configured
-    if youtube_api_configured:
-        try:
-            youtube = get_youtube_client()
-            # Try a simple search query
-            response = youtube.videos().list(
-                part="snippet",
-                chart="mostPopular",
-                maxResults=1
-            ).execute()
-            if response and "items" in response:
-                youtube_api_working = True
-        except Exception as e:
-            logger.error(f"YouTube API test failed: {str(e)}")
-    
+
+    # Kick off a background probe when the cached result is stale; the
+    # lock ensures only one probe runs at a time
+    if (youtube_api_configured
+            and time.monotonic() - _health_state["checked_at"] > HEALTH_PROBE_TTL
+            and _health_refreshing.acquire(blocking=False)):
+        threading.Thread(target=_refresh_health, daemon=True).start()
+
     return jsonify({
         "status": "ok",
         "message": "YouTube Content Analyzer API is running",
         "gemini_api_configured": bool(GEMINI_API_KEY and GEMINI_API_KEY != "your-api-key-here"),
         "youtube_api_configured": youtube_api_configured,
-        "youtube_api_working": youtube_api_working
+        "youtube_api_working": _health_state["working"]
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Sizes of the in-process stores, for spotting leaks early
+
+    Only meaningful when Redis is unavailable and the fallback dicts are
+    in use; with Redis these stay near zero.
+    """
+    with _history_lock:
+        sessions = len(conversation_history)
+    with _flow_lock:
+        flow_sessions = len(flow_steps)
+    return jsonify({
+        "conversation_sessions": sessions,
+        "flow_sessions": flow_sessions,
+        "gemini_cache_entries": len(_gemini_response_cache),
+        "tool_cache_entries": len(_tool_result_cache),
+        "endpoint_cache_entries": len(_endpoint_response_cache),
+        "redis_connected": redis_client is not None
+    })
+
+# Mock data templates for the tool fallback paths, built once at module
+# level so each call only substitutes the niche/topic text instead of
+# reconstructing identical nested structures
+def _fill_template(value, subs):
+    """Recursively substitute {placeholders} in a nested mock template"""
+    if isinstance(value, str):
+        return value.format(**subs)
+    if isinstance(value, list):
+        return [_fill_template(item, subs) for item in value]
+    if isinstance(value, dict):
+        return {key: _fill_template(item, subs) for key, item in value.items()}
+    return value
+
+MOCK_TRENDING_TEMPLATE = [
+    {
+        "title": "Top 10 {niche_cap} Tips for Beginners",
+        "views": "1200000",
+        "likes": "45000",
+        "channel": "{niche_cap} Expert",
+        "video_id": "dQw4w9WgXcQ",  # Placeholder ID
+        "thumbnail": "https://i.ytimg.com/vi/dQw4w9WgXcQ/hqdefault.jpg",
+        "keywords": ["{niche}", "beginners", "tips", "tutorial"],
+        "description": "Learn the best {niche} tips and tricks in this comprehensive guide.",
+        "published_at": "2023-01-01T00:00:00Z",
+        "duration": "PT10M30S"
+    },
+    # Additional mock videos as before...
+]
+
+MOCK_CONTENT_TEMPLATE = {
+    "video_ideas": [
+        {
+            "title": "7 Essential {topic_cap} Techniques for 2023",
+            "hook": "Did you know 80% of experts use these {topic} strategies?",
+            "outline": [
+                "Introduction (0:00-1:30)",
+                "Common {topic} mistakes (1:30-4:00)",
+                "The 7 key {topic} techniques (4:00-12:00)",
+                "Implementation steps (12:00-15:00)",
+                "Results you can expect (15:00-17:00)",
+                "Call to action (17:00-18:00)"
+            ]
+        },
+        {
+            "title": "The Ultimate Beginner's Guide to {topic_cap}",
+            "hook": "This simple {topic} approach changed everything for me...",
+            "outline": [
+                "My story and struggle with {topic} (0:00-2:30)",
+                "The breakthrough moment (2:30-4:00)",
+                "Step-by-step {topic} methodology (4:00-10:00)",
+                "Avoiding common pitfalls (10:00-13:00)",
+                "Advanced tips for faster results (13:00-16:00)",
+                "Next steps and resources (16:00-18:00)"
+            ]
+        }
+    ],
+    "thumbnail_ideas": [
+        "Bold text overlay with '{topic}' and shocked face reaction",
+        "Before/after split screen showing {topic} results",
+        "Question headline: 'Is your {topic} approach wrong?' with arrow pointing to solution"
+    ],
+    "script_template": """INTRO:
+Hook viewers with a surprising stat about {topic}
+Teaser of what they'll learn about {topic}
+
+MAIN CONTENT:
+Point 1: Current state of {topic}
+Point 2: Common problems with {topic} approaches
+Point 3-5: Detailed steps for mastering {topic}
+
+CONCLUSION:
+Summary of {topic} benefits
+Call to action
+Teaser for next video on advanced {topic} techniques"""
+}
+
+MOCK_PERFORMANCE_DATA = {
+    "views": "12,345",
+    "watch_time": "45,678 minutes",
+    "average_view_duration": "4:32",
+    "likes": "1,234",
+    "comments": "456",
+    "ctr": "4.8%",
+    "audience_retention": [
+        {"segment": "0-30 seconds", "retention": "95%"},
+        {"segment": "30-60 seconds", "retention": "87%"},
+        {"segment": "1-2 minutes", "retention": "76%"},
+        {"segment": "2-5 minutes", "retention": "65%"},
+        {"segment": "5+ minutes", "retention": "43%"}
+    ],
+    "improvement_suggestions": [
+        "Add a stronger hook in the first 30 seconds",
+        "Create more engaging content between 2-5 minute mark",
+        "Add cards and end screens for better retention",
+        "Respond to more comments to boost engagement",
+        "Create follow-up content based on most-watched segments"
+    ]
+}
+
 # Define Tool classes for Agentic AI
 class Tool:
     def __init__(self, name: str, description: str):
@@ -137,7 +537,7 @@ class YouTubeScraperTool(Tool):
     
     def execute(self, niche: str) -> Dict[str, Any]:
         """Get trending videos from YouTube based on niche keyword"""
-        logger.info(f"Searching YouTube videos for niche: {niche}")
+        logger.info("Searching YouTube videos for niche: %s", niche)
         log_flow_step(GLOBAL_TOOL_SESSION, "TOOL", f"YouTubeScraperTool executing with niche: {niche}")
         
         try:
@@ -158,21 +558,18 @@ class YouTubeScraperTool(Tool):
             log_flow_step(GLOBAL_TOOL_SESSION, "RESULT", f"Found {len(video_ids)} video IDs")
             
             # Get video statistics (views, likes, etc.)
-            videos_response = youtube.videos().list(
-                part="snippet,statistics,contentDetails",
-                id=",".join(video_ids)
-            ).execute()
-            
+            videos = fetch_videos_batched(video_ids)
+
             trending_videos = []
-            for video in videos_response['items']:
+            fallback = []  # (result index, title + description) for videos without tags
+            for video in videos:
                 # Extract keywords from tags if available
                 keywords = video['snippet'].get('tags', [])
                 if not keywords:
                     # If no tags, extract keywords from title and description
-                    all_text = f"{video['snippet']['title']} {video['snippet']['description']}"
-                    keywords = [word.lower() for word in re.findall(r'\b\w{4,}\b', all_text)]
-                    keywords = list(set(keywords))[:5]  # Take up to 5 unique keywords
-                
+                    fallback.append((len(trending_videos),
+                                     f"{video['snippet']['title']} {video['snippet']['description']}"))
+
                 trending_videos.append({
                     "title": video['snippet']['title'],
                     "views": video['statistics'].get('viewCount', '0'),
@@ -185,36 +582,128 @@ class YouTubeScraperTool(Tool):
                     "published_at": video['snippet']['publishedAt'],
                     "duration": video['contentDetails']['duration']
                 })
-            
+
+            if fallback:
+                # One regex pass over all tag-less videos: join their texts
+                # with a NUL separator (which \w never matches) and map each
+                # match back to its video by bisecting the start offsets.
+                # Keeps the first 5 unique keywords per video in order.
+                # Offsets must come from the lowered strings: lowercasing
+                # can change a string's length (e.g. 'İ' becomes two
+                # characters), which would shift every later boundary.
+                lowered = [text.lower() for _, text in fallback]
+                starts = []
+                pos = 0
+                for text in lowered:
+                    starts.append(pos)
+                    pos += len(text) + 1
+                joined = "\x00".join(lowered)
+                buckets = [{} for _ in fallback]
+                for match in WORD_RE.finditer(joined):
+                    bucket = buckets[bisect_right(starts, match.start()) - 1]
+                    if len(bucket) < 5:
+                        bucket.setdefault(match.group(), None)
+                for (index, _), bucket in zip(fallback, buckets):
+                    trending_videos[index]["keywords"] = list(bucket)
+
             return {
                 "trending_videos": trending_videos
             }
             
         except HttpError as e:
-            logger.error(f"YouTube API error: {e}")
+            logger.error("YouTube API error: %s", e)
             # Fallback to mock data if API fails
             return self._mock_response(niche)
     
     def _mock_response(self, niche: str) -> Dict[str, Any]:
         """Provide mock data as fallback"""
-        logger.warning(f"Using mock data for niche: {niche}")
-        return {
-            "trending_videos": [
-                {
-                    "title": f"Top 10 {niche.capitalize()} Tips for Beginners",
-                    "views": "1200000",
-                    "likes": "45000",
-                    "channel": f"{niche.capitalize()} Expert",
-                    "video_id": "dQw4w9WgXcQ",  # Placeholder ID
-                    "thumbnail": "https://i.ytimg.com/vi/dQw4w9WgXcQ/hqdefault.jpg",
-                    "keywords": [niche, "beginners", "tips", "tutorial"],
-                    "description": f"Learn the best {niche} tips and tricks in this comprehensive guide.",
-                    "published_at": "2023-01-01T00:00:00Z",
-                    "duration": "PT10M30S"
-                },
-                # Additional mock videos as before...
-            ]
-        }
+        logger.warning("Using mock data for niche: %s", niche)
+        subs = {"niche": niche, "niche_cap": niche.capitalize()}
+        # The mock flag keeps fabricated data out of the tool cache
+        return {"trending_videos": _fill_template(MOCK_TRENDING_TEMPLATE, subs), "mock": True}
+
+class YouTubeScraperBatchTool(Tool):
+    def __init__(self):
+        super().__init__(
+            name="youtube_scraper_batch",
+            description="Scrapes trending videos for several niches at once; pass a list of niche keywords"
+        )
+
+    def execute(self, niches) -> Dict[str, Any]:
+        """Get trending videos for several niches with a single search call"""
+        # Gemini sometimes passes a delimited string instead of a list
+        if isinstance(niches, str):
+            niches = re.split(r'[|,]', niches)
+        niches = list(dict.fromkeys(n.strip() for n in niches if n and n.strip()))
+        if not niches:
+            return {"error": "No niches provided"}
+
+        scraper = available_tools["youtube_scraper"]
+        if len(niches) == 1:
+            return {"niches": {niches[0]: scraper.execute(niches[0])}}
+
+        logger.info("Searching YouTube videos for niches: %s", niches)
+        log_flow_step(GLOBAL_TOOL_SESSION, "TOOL", f"YouTubeScraperBatchTool executing with niches: {niches}")
+
+        try:
+            youtube = get_youtube_client()
+
+            # One search covers all niches: YouTube treats | as OR, and a
+            # single call costs the same 100 quota units as one niche
+            search_response = youtube.search().list(
+                q=" | ".join(niches),
+                part="snippet",
+                type="video",
+                maxResults=min(10 * len(niches), 50),
+                order="viewCount",
+                relevanceLanguage="en"
+            ).execute()
+
+            video_ids = [item['id']['videoId'] for item in search_response['items']]
+            log_flow_step(GLOBAL_TOOL_SESSION, "RESULT", f"Found {len(video_ids)} video IDs across {len(niches)} niches")
+            videos = fetch_videos_batched(video_ids)
+
+            # Assign each video to the niche whose words best overlap its
+            # title/description/tags; unmatched videos go to the first niche
+            niche_words = [frozenset(WORD_RE.findall(niche.lower())) | {niche.lower()}
+                           for niche in niches]
+            grouped = {niche: [] for niche in niches}
+            for video in videos:
+                keywords = video['snippet'].get('tags', [])
+                text = " ".join((video['snippet']['title'],
+                                 video['snippet']['description'],
+                                 " ".join(keywords))).lower()
+                if not keywords:
+                    extracted = {}
+                    for match in WORD_RE.finditer(text):
+                        if len(extracted) < 5:
+                            extracted.setdefault(match.group(), None)
+                    keywords = list(extracted)
+
+                scores = [sum(word in text for word in words) for words in niche_words]
+                best = max(range(len(niches)), key=scores.__getitem__)
+                grouped[niches[best if scores[best] else 0]].append({
+                    "title": video['snippet']['title'],
+                    "views": video['statistics'].get('viewCount', '0'),
+                    "likes": video['statistics'].get('likeCount', '0'),
+                    "channel": video['snippet']['channelTitle'],
+                    "video_id": video['id'],
+                    "thumbnail": video['snippet']['thumbnails']['high']['url'],
+                    "keywords": keywords,
+                    "description": video['snippet']['description'],
+                    "published_at": video['snippet']['publishedAt'],
+                    "duration": video['contentDetails']['duration']
+                })
+
+            return {
+                "niches": {niche: {"trending_videos": grouped[niche]} for niche in niches}
+            }
+
+        except HttpError as e:
+            logger.error("YouTube API error: %s", e)
+            # Fallback to mock data per niche if API fails
+            return {"niches": {niche: scraper._mock_response(niche) for niche in niches},
+                    "mock": True}
 
 class ContentAnalyzerTool(Tool):
     def __init__(self):
@@ -226,7 +715,7 @@ class ContentAnalyzerTool(Tool):
     def execute(self, content: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze content for SEO optimization"""
         title = content.get('title', '')
-        logger.info(f"Analyzing content: {title}")
+        logger.info("Analyzing content: %s", title)
         log_flow_step(GLOBAL_TOOL_SESSION, "TOOL", f"ContentAnalyzerTool analyzing: {title[:50]}...")
         
         description = content.get('description', '')
@@ -234,34 +723,39 @@ class ContentAnalyzerTool(Tool):
         
         # Extract keywords from title and description
         log_flow_step(GLOBAL_TOOL_SESSION, "TOOL", f"Extracting keywords from title and description")
-        all_text = f"{title} {description}"
-        extracted_keywords = re.findall(r'\b\w{4,}\b', all_text.lower())
-        extracted_keywords = [keyword for keyword in extracted_keywords 
-                              if keyword not in ['this', 'that', 'with', 'from', 'have', 'what', 'your']]
-        
-        # Combine provided and extracted keywords
-        keywords = list(set(provided_keywords + extracted_keywords))
+        title_counts = Counter(WORD_RE.findall(title.lower()))
+        desc_counts = Counter(WORD_RE.findall(description.lower()))
+        extracted_keywords = [keyword for keyword in title_counts + desc_counts
+                              if keyword not in STOPWORDS]
+
+        # Combine provided and extracted keywords (order-preserving dedupe)
+        keywords = list(dict.fromkeys(provided_keywords + extracted_keywords))
         log_flow_step(GLOBAL_TOOL_SESSION, "RESULT", f"Found {len(keywords)} unique keywords")
-        
-        # Calculate keyword frequency
-        keyword_freq = {}
-        for keyword in keywords:
-            # Check if keyword appears in title (higher weight)
-            title_count = title.lower().count(keyword.lower()) * 2
-            # Check if keyword appears in description
-            desc_count = description.lower().count(keyword.lower())
-            keyword_freq[keyword] = title_count + desc_count
-        
-        # Sort keywords by frequency
-        sorted_keywords = sorted(keyword_freq.items(), key=lambda x: x[1], reverse=True)
-        top_keywords = sorted_keywords[:10] if sorted_keywords else []
+
+        # Keyword frequency from the token counts; title hits count double
+        keyword_freq = {keyword: title_counts[keyword.lower()] * 2 + desc_counts[keyword.lower()]
+                        for keyword in keywords}
+
+        # When a keyword vocabulary is provided, re-count those with a
+        # single flashtext pass: it also matches multi-word phrases the
+        # word tokenizer above would split apart
+        if KeywordProcessor is not None and provided_keywords:
+            kp = KeywordProcessor(case_sensitive=False)
+            kp.add_keywords_from_list(list(provided_keywords))
+            title_hits = Counter(kp.extract_keywords(title))
+            desc_hits = Counter(kp.extract_keywords(description))
+            for keyword in provided_keywords:
+                keyword_freq[keyword] = title_hits[keyword] * 2 + desc_hits[keyword]
+
+        # Top keywords by frequency (heap-based top-k, no full sort)
+        top_keywords = Counter(keyword_freq).most_common(10)
         
         # Calculate title effectiveness
         title_effectiveness = self._calculate_title_effectiveness(title)
         
-        # Calculate description effectiveness
-        description_effectiveness = self._calculate_description_effectiveness(description)
-        
+        # Calculate description effectiveness (and reusable feature flags)
+        description_effectiveness, desc_flags = self._calculate_description_effectiveness(description)
+
         # Overall SEO score (weighted average)
         seo_score = int(title_effectiveness * 0.5 + description_effectiveness * 0.3 + min(len(top_keywords) * 7, 20))
         
@@ -272,61 +766,59 @@ class ContentAnalyzerTool(Tool):
             "top_keywords": [k for k, v in top_keywords],
             "keyword_density": {k: v for k, v in top_keywords},
             "improvement_suggestions": self._generate_improvement_suggestions(
-                title, description, title_effectiveness, description_effectiveness, top_keywords
+                title, description, title_effectiveness, description_effectiveness,
+                top_keywords, desc_flags
             )
         }
     
     def _calculate_title_effectiveness(self, title: str) -> int:
         """Calculate title effectiveness score (0-100)"""
-        score = 50  # Base score
-        
-        # Length factors (ideal: 40-60 characters)
-        title_length = len(title)
-        if 40 <= title_length <= 60:
-            score += 20
-        elif 30 <= title_length <= 70:
-            score += 10
-        
-        # Engagement factors
-        if any(word in title.lower() for word in ['how', 'why', 'what']):
-            score += 10  # Question/explanation titles perform well
-        
-        if any(word in title.lower() for word in ['top', 'best', 'ultimate', 'complete', 'guide']):
-            score += 5  # Superlatives/guide indicators
-        
-        if re.search(r'\d+', title):
-            score += 5  # Numbers in title
-        
+        # Lowercase once; the old version re-lowercased per check
+        title_l = title.lower()
+        score = 50 + sum(weight for predicate, weight in TITLE_RULES if predicate(title_l))
+
         # Normalize score
         return min(max(score, 0), 100)
     
-    def _calculate_description_effectiveness(self, description: str) -> int:
-        """Calculate description effectiveness score (0-100)"""
+    def _calculate_description_effectiveness(self, description: str) -> tuple:
+        """
+        Calculate description effectiveness score (0-100)
+
+        Returns the score together with the feature flags it was scored
+        on, so _generate_improvement_suggestions can reuse them instead
+        of re-running the same regex scans.
+        """
         score = 50  # Base score
-        
+
+        flags = {
+            "length": len(description),
+            "has_link": 'http' in description or 'www.' in description,
+            "has_cta": CTA_RE.search(description) is not None,
+            "has_timestamps": TS_RE.search(description) is not None,
+        }
+
         # Length factors
-        desc_length = len(description)
-        if desc_length > 250:
+        if flags["length"] > 250:
             score += 20  # Good detailed description
-        elif desc_length > 100:
+        elif flags["length"] > 100:
             score += 10  # Decent description
-        
+
         # Content factors
-        if 'http' in description or 'www.' in description:
+        if flags["has_link"]:
             score += 10  # Contains links
-        
-        if re.search(r'subscribe|follow|like|comment', description, re.IGNORECASE):
+
+        if flags["has_cta"]:
             score += 5  # Call to action
-        
-        if re.search(r'timestamps|(\d+:\d+)', description, re.IGNORECASE):
+
+        if flags["has_timestamps"]:
             score += 10  # Contains timestamps
-        
+
         # Normalize score
-        return min(max(score, 0), 100)
-    
-    def _generate_improvement_suggestions(self, title: str, description: str, 
+        return min(max(score, 0), 100), flags
+
+    def _generate_improvement_suggestions(self, title: str, description: str,
                                          title_score: int, desc_score: int,
-                                         top_keywords: List) -> List[str]:
+                                         top_keywords: List, desc_flags: Dict[str, Any]) -> List[str]:
         """Generate improvement suggestions based on content analysis"""
         suggestions = []
         
@@ -340,21 +832,21 @@ class ContentAnalyzerTool(Tool):
             if not any(word in title.lower() for word in ['how', 'why', 'what', '?']):
                 suggestions.append("Consider using question formats in your title")
             
-            if not re.search(r'\d+', title):
+            if _DIGITS.isdisjoint(title):
                 suggestions.append("Consider adding numbers to your title (e.g., '7 Ways to...')")
         
-        # Description suggestions
+        # Description suggestions (flags computed during scoring)
         if desc_score < 70:
-            if len(description) < 100:
+            if desc_flags["length"] < 100:
                 suggestions.append("Add more details to your description (aim for 250+ characters)")
-            
-            if not ('http' in description or 'www.' in description):
+
+            if not desc_flags["has_link"]:
                 suggestions.append("Include relevant links in your description")
-            
-            if not re.search(r'subscribe|follow|like|comment', description, re.IGNORECASE):
+
+            if not desc_flags["has_cta"]:
                 suggestions.append("Add a clear call-to-action in your description")
-            
-            if not re.search(r'timestamps|(\d+:\d+)', description, re.IGNORECASE):
+
+            if not desc_flags["has_timestamps"]:
                 suggestions.append("Add timestamps for longer videos to improve user experience")
         
         # Keyword suggestions
@@ -379,12 +871,11 @@ class ContentGeneratorTool(Tool):
     
     def execute(self, prompt: str, trending_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Generate content ideas based on prompt and trending data"""
-        logger.info(f"Generating content based on prompt: {prompt}")
+        logger.info("Generating content based on prompt: %s", prompt)
         log_flow_step(GLOBAL_TOOL_SESSION, "TOOL", f"ContentGeneratorTool generating ideas for: {prompt}")
         
         try:
             # Use Gemini to generate unique content ideas for this specific topic
-            model = genai.GenerativeModel('gemini-2.0-flash')
             log_flow_step(GLOBAL_TOOL_SESSION, "TOOL", f"Calling Gemini model to generate content ideas")
             
             generation_prompt = f"""
@@ -417,30 +908,25 @@ class ContentGeneratorTool(Tool):
             The script template should be detailed and include placeholders for key information.
             """
             
-            # Generate response
-            response = model.generate_content(generation_prompt)
-            response_text = response.text
+            # Generate response, streamed so chunks are consumed as the
+            # model produces them instead of buffering the full reply in
+            # the SDK first
+            response = GEMINI_MODEL.generate_content(generation_prompt, stream=True)
+            response_text = "".join(chunk.text for chunk in response)
             log_flow_step(GLOBAL_TOOL_SESSION, "RESULT", f"Gemini generated content response of {len(response_text)} characters")
             
-            # Extract JSON content
-            json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
-            if json_match:
-                content_json = json_match.group(1)
-            else:
-                # If not in code block, try to extract JSON directly
-                json_pattern = r'({[\s\S]*})'
-                json_match = re.search(json_pattern, response_text)
-                if json_match:
-                    content_json = json_match.group(1)
-                else:
-                    content_json = response_text
-            
-            # Clean the JSON string
-            content_json = content_json.replace('\n', ' ').replace('```', '')
-            
             try:
-                # Parse the JSON response
-                content_data = json.loads(content_json)
+                # Extract the JSON object in one scan: start at the first
+                # '{' (past any ```json fence) and let raw_decode parse
+                # exactly one value in place. This tolerates surrounding
+                # prose and trailing text without regex passes or string
+                # copies; strict=False accepts literal newlines inside
+                # strings, which Gemini sometimes emits.
+                fence = JSON_FENCE_RE.search(response_text)
+                start = response_text.find('{', fence.start() if fence else 0)
+                if start < 0:
+                    raise json.JSONDecodeError("no JSON object in response", response_text, 0)
+                content_data, _ = json.JSONDecoder(strict=False).raw_decode(response_text, start)
                 
                 # Ensure all required fields are present
                 if "video_ideas" not in content_data or "thumbnail_ideas" not in content_data or "script_template" not in content_data:
@@ -488,63 +974,21 @@ class ContentGeneratorTool(Tool):
                 return content_data
                 
             except json.JSONDecodeError as e:
-                logger.error(f"Error parsing content generation JSON: {e}")
+                logger.error("Error parsing content generation JSON: %s", e)
                 # Fall back to simplified format with topic-specific content
                 return self._create_fallback_content(prompt)
                 
         except Exception as e:
-            logger.error(f"Error in content generation: {e}")
+            logger.error("Error in content generation: %s", e)
             # Fall back to simplified format with topic-specific content
             return self._create_fallback_content(prompt)
     
     def _create_fallback_content(self, topic: str) -> Dict[str, Any]:
         """Create fallback content specific to the topic if AI generation fails"""
-        return {
-            "video_ideas": [
-                {
-                    "title": f"7 Essential {topic.capitalize()} Techniques for 2023",
-                    "hook": f"Did you know 80% of experts use these {topic} strategies?",
-                    "outline": [
-                        "Introduction (0:00-1:30)",
-                        f"Common {topic} mistakes (1:30-4:00)",
-                        f"The 7 key {topic} techniques (4:00-12:00)",
-                        "Implementation steps (12:00-15:00)",
-                        "Results you can expect (15:00-17:00)",
-                        "Call to action (17:00-18:00)"
-                    ]
-                },
-                {
-                    "title": f"The Ultimate Beginner's Guide to {topic.capitalize()}",
-                    "hook": f"This simple {topic} approach changed everything for me...",
-                    "outline": [
-                        "My story and struggle with " + topic + " (0:00-2:30)",
-                        "The breakthrough moment (2:30-4:00)",
-                        f"Step-by-step {topic} methodology (4:00-10:00)",
-                        "Avoiding common pitfalls (10:00-13:00)",
-                        "Advanced tips for faster results (13:00-16:00)",
-                        "Next steps and resources (16:00-18:00)"
-                    ]
-                }
-            ],
-            "thumbnail_ideas": [
-                f"Bold text overlay with '{topic}' and shocked face reaction",
-                f"Before/after split screen showing {topic} results",
-                f"Question headline: 'Is your {topic} approach wrong?' with arrow pointing to solution"
-            ],
-            "script_template": f"""INTRO:
-Hook viewers with a surprising stat about {topic}
-Teaser of what they'll learn about {topic}
-
-MAIN CONTENT:
-Point 1: Current state of {topic}
-Point 2: Common problems with {topic} approaches
-Point 3-5: Detailed steps for mastering {topic}
-
-CONCLUSION:
-Summary of {topic} benefits
-Call to action
-Teaser for next video on advanced {topic} techniques"""
-        }
+        subs = {"topic": topic, "topic_cap": topic.capitalize()}
+        content = _fill_template(MOCK_CONTENT_TEMPLATE, subs)
+        content["mock"] = True
+        return content
 
 class PerformanceTrackerTool(Tool):
     def __init__(self):
@@ -553,18 +997,18 @@ class PerformanceTrackerTool(Tool):
             description="Tracks video performance metrics and suggests improvements"
         )
     
-    def execute(self, video_url: str) -> Dict[str, Any]:
+    def execute(self, video_url: str, video_id: Optional[str] = None) -> Dict[str, Any]:
         """Track performance of a video based on URL"""
-        logger.info(f"Tracking performance for video: {video_url}")
+        logger.info("Tracking performance for video: %s", video_url)
         log_flow_step(GLOBAL_TOOL_SESSION, "TOOL", f"PerformanceTrackerTool analyzing video: {video_url}")
-        
-        # Extract video ID from URL
-        video_id = None
-        if "youtube.com" in video_url:
-            video_id = video_url.split("v=")[1].split("&")[0] if "v=" in video_url else None
-        elif "youtu.be" in video_url:
-            video_id = video_url.split("/")[-1]
-        
+
+        # Extract the video ID unless the caller already has it (the
+        # endpoint's validation regex captures it); the same anchored
+        # pattern covers watch?v=, youtu.be, /shorts/, /embed/ and /live/
+        if not video_id:
+            match = YT_URL_RE.match(video_url.strip())
+            video_id = match.group(1) if match else None
+
         if not video_id:
             log_flow_step(GLOBAL_TOOL_SESSION, "ERROR", f"Invalid YouTube URL: {video_url}")
             return {"error": "Invalid YouTube URL"}
@@ -572,40 +1016,50 @@ class PerformanceTrackerTool(Tool):
         log_flow_step(GLOBAL_TOOL_SESSION, "RESULT", f"Extracted video ID: {video_id}")
         
         try:
-            youtube = get_youtube_client()
-            
-            # Get video statistics
-            video_response = youtube.videos().list(
-                part="snippet,statistics,contentDetails",
-                id=video_id
-            ).execute()
-            
+            def fetch_video():
+                # Get video statistics
+                return get_youtube_client().videos().list(
+                    part="snippet,statistics,contentDetails",
+                    id=video_id
+                ).execute()
+
+            def fetch_comments():
+                # Get comments (most recent)
+                try:
+                    return get_youtube_client().commentThreads().list(
+                        part="snippet",
+                        videoId=video_id,
+                        order="relevance",
+                        maxResults=20
+                    ).execute()
+                except HttpError:
+                    # Comments might be disabled
+                    return {}
+
+            # The two lookups are independent, so fire them concurrently:
+            # wall time is the slower of the two round trips, not the sum.
+            # Each worker builds its own client; googleapiclient's http
+            # objects are not safe to share across threads.
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                video_future = pool.submit(fetch_video)
+                comments_future = pool.submit(fetch_comments)
+                video_response = video_future.result()
+                comments_response = comments_future.result()
+
             if not video_response['items']:
                 return {"error": "Video not found"}
-            
+
             video = video_response['items'][0]
-            
-            # Get comments (most recent)
-            try:
-                comments_response = youtube.commentThreads().list(
-                    part="snippet",
-                    videoId=video_id,
-                    order="relevance",
-                    maxResults=20
-                ).execute()
-                
-                comments = []
-                for item in comments_response.get('items', []):
-                    comment = item['snippet']['topLevelComment']['snippet']
-                    comments.append({
-                        "author": comment['authorDisplayName'],
-                        "text": comment['textDisplay'],
-                        "likes": comment['likeCount'],
-                        "published_at": comment['publishedAt']
-                    })
-            except HttpError:
-                # Comments might be disabled
-                comments = []
+
+            comments = []
+            for item in comments_response.get('items', []):
+                comment = item['snippet']['topLevelComment']['snippet']
+                comments.append({
+                    "author": comment['authorDisplayName'],
+                    "text": comment['textDisplay'],
+                    "likes": comment['likeCount'],
+                    "published_at": comment['publishedAt']
+                })
             
             # Process data
             stats = video['statistics']
@@ -665,96 +1119,292 @@ class PerformanceTrackerTool(Tool):
             }
             
         except HttpError as e:
-            logger.error(f"YouTube API error: {e}")
+            logger.error("YouTube API error: %s", e)
             # Fallback to mock data
             return self._mock_response(video_id)
     
     def _mock_response(self, video_id: str) -> Dict[str, Any]:
         """Provide mock data as fallback"""
-        logger.warning(f"Using mock data for video ID: {video_id}")
-        return {
-            "views": "12,345",
-            "watch_time": "45,678 minutes",
-            "average_view_duration": "4:32",
-            "likes": "1,234",
-            "comments": "456",
-            "ctr": "4.8%",
-            "audience_retention": [
-                {"segment": "0-30 seconds", "retention": "95%"},
-                {"segment": "30-60 seconds", "retention": "87%"},
-                {"segment": "1-2 minutes", "retention": "76%"},
-                {"segment": "2-5 minutes", "retention": "65%"},
-                {"segment": "5+ minutes", "retention": "43%"}
-            ],
-            "improvement_suggestions": [
-                "Add a stronger hook in the first 30 seconds",
-                "Create more engaging content between 2-5 minute mark",
-                "Add cards and end screens for better retention",
-                "Respond to more comments to boost engagement",
-                "Create follow-up content based on most-watched segments"
-            ]
-        }
+        logger.warning("Using mock data for video ID: %s", video_id)
+        # Static template; deep-copy so callers can't mutate the shared dict
+        data = copy.deepcopy(MOCK_PERFORMANCE_DATA)
+        data["mock"] = True
+        return data
 
 # Initialize tools
 available_tools = {
     "youtube_scraper": YouTubeScraperTool(),
+    "youtube_scraper_batch": YouTubeScraperBatchTool(),
     "content_analyzer": ContentAnalyzerTool(),
     "content_generator": ContentGeneratorTool(),
     "performance_tracker": PerformanceTrackerTool()
 }
 
-# Function to handle agentic LLM calls
-def call_gemini(prompt, conversation_id=None, tool_results=None):
+# Tool description block for Gemini prompts, built once since tools are static
+TOOLS_DESCRIPTION = "You have access to the following tools:\n" + "".join(
+    f"- {name}: {tool.description}\n" for name, tool in available_tools.items()
+)
+
+# Bound execute methods, resolved once at import instead of per dispatch
+_TOOL_DISPATCH = {name: tool.execute for name, tool in available_tools.items()}
+
+# Direct bindings for the handlers' own tool calls; also makes a missing
+# tool a startup error instead of a per-request KeyError
+_YT_SCRAPER = available_tools["youtube_scraper"]
+_CONTENT_ANALYZER = available_tools["content_analyzer"]
+_CONTENT_GENERATOR = available_tools["content_generator"]
+_PERFORMANCE_TRACKER = available_tools["performance_tracker"]
+
+# Words of 4+ characters, used for keyword extraction
+WORD_RE = re.compile(r'\b\w{4,}\b')
+
+# Patterns used by the content analyzer's scoring helpers
+# "Contains a digit" needs no regex: set.isdisjoint is one C-level scan
+_DIGITS = frozenset('0123456789')
+CTA_RE = re.compile(r'subscribe|follow|like|comment', re.IGNORECASE)
+TS_RE = re.compile(r'timestamps|(\d+:\d+)', re.IGNORECASE)
+
+# Common words excluded from extracted keywords
+STOPWORDS = frozenset({'this', 'that', 'with', 'from', 'have', 'what', 'your'})
+
+# Word groups the title rules look for; substring matches on purpose so
+# e.g. "how-to" and "what's" still count
+QUESTION_WORDS = ('how', 'why', 'what')
+SUPERLATIVES = ('top', 'best', 'ultimate', 'complete', 'guide')
+
+# Title scoring rules as (predicate over the lowercased title, weight);
+# keeping them as data makes weight tuning a one-line change
+TITLE_RULES = (
+    # Length factors (ideal: 40-60 characters)
+    (lambda t: 40 <= len(t) <= 60, 20),
+    (lambda t: not (40 <= len(t) <= 60) and 30 <= len(t) <= 70, 10),
+    # Question/explanation titles perform well
+    (lambda t: any(word in t for word in QUESTION_WORDS), 10),
+    # Superlatives/guide indicators
+    (lambda t: any(word in t for word in SUPERLATIVES), 5),
+    # Numbers in title
+    (lambda t: not _DIGITS.isdisjoint(t), 5),
+)
+
+# Locates a ```json fence in Gemini's content generation replies; used as
+# a hint for where the JSON object starts
+JSON_FENCE_RE = re.compile(r'```json\s*', re.DOTALL)
+
+# Precompiled patterns for parsing tool calls out of Gemini responses
+TOOL_CALL_RE = re.compile(r"TOOL: (\w+)\nPARAMS: ({.*})", re.DOTALL)
+URL_RE = re.compile(r'https?://[^\s"]+')
+
+# Anchored YouTube video URL validator; one scan both validates the URL
+# shape and captures the 11-character video ID
+YT_URL_RE = re.compile(
+    r'^https?://(?:(?:www\.|m\.)?youtube\.com/(?:watch\?(?:[^&\s]*&)*v=|shorts/|embed/|live/)|youtu\.be/)'
+    r'([A-Za-z0-9_-]{11})'
+)
+
+def _parse_tool_params(params_str: str) -> Dict[str, Any]:
     """
-    Call Gemini API with prompt and handle tool calls
-    
-    Args:
-        prompt (str): The user prompt
-        conversation_id (str): ID to track conversation history
+    Parse a tool PARAMS block in a single pass
+
+    Gemini emits params as a loosely JSON-shaped dict, often with single
+    quotes, unquoted keys, or stray quotes around URLs. Instead of patching
+    the string with several regex passes and re-parsing it as JSON, walk it
+    once and build the dict directly.
+    """
+    params = {}
+    start = params_str.find('{') + 1
+    end = params_str.rfind('}')
+    if start == 0 or end < 0:
+        return params
+
+    i = start
+    while i < end:
+        # Skip separators before the key
+        while i < end and params_str[i] in ' \t\r\n,':
+            i += 1
+        if i >= end:
+            break
+
+        # Key: quoted or a bare word up to the colon
+        if params_str[i] in '"\'':
+            quote = params_str[i]
+            closing = params_str.find(quote, i + 1)
+            if closing < 0 or closing > end:
+                break
+            key = params_str[i + 1:closing]
+            i = closing + 1
+        else:
+            colon = params_str.find(':', i)
+            if colon < 0 or colon >= end:
+                break
+            key = params_str[i:colon].strip().strip('"\'')
+            i = colon
+
+        colon = params_str.find(':', i)
+        if colon < 0 or colon >= end:
+            break
+        i = colon + 1
+        while i < end and params_str[i] in ' \t\r\n':
+            i += 1
+
+        # Value
+        if i < end and params_str[i] in '"\'':
+            # Quoted string; tolerate stray quotes in the middle, which the
+            # model sometimes emits around URL schemes
+            i += 1
+            chars = []
+            while i < end:
+                c = params_str[i]
+                if c in '"\'':
+                    # Skip the quote run, then check whether the value ends here
+                    after = i
+                    while after < end and params_str[after] in '"\'':
+                        after += 1
+                    peek = after
+                    while peek < end and params_str[peek] in ' \t\r\n':
+                        peek += 1
+                    if peek >= end or params_str[peek] == ',':
+                        i = after
+                        break
+                    # Stray quote inside the value - drop it and keep going
+                    i = after
+                    continue
+                chars.append(c)
+                i += 1
+            value = ''.join(chars)
+        else:
+            comma = params_str.find(',', i)
+            if comma < 0 or comma > end:
+                comma = end
+            raw = params_str[i:comma].strip()
+            if raw in ('true', 'True'):
+                value = True
+            elif raw in ('false', 'False'):
+                value = False
+            else:
+                try:
+                    value = int(raw)
+                except ValueError:
+                    try:
+                        value = float(raw)
+                    except ValueError:
+                        value = raw.strip('"\'')
+            i = comma
+
+        if key:
+            params[key] = value
+
+    return params
+
+
+def _recover_tool_params(params_str: str) -> Dict[str, Any]:
+    """
+    Parse a PARAMS string into a dict, degrading gracefully
+
+    Well-formed JSON parses directly; malformed strings go through the
+    single-pass repair parser; as a last resort a bare URL is pulled out
+    so performance-tracker calls still work. Returns {} if nothing usable
+    can be recovered.
+    """
+    try:
+        params = json_loads(params_str)
+        if isinstance(params, dict) and params:
+            return params
+    except (json.JSONDecodeError, ValueError):
+        pass
+
+    params = _parse_tool_params(params_str)
+    if params:
+        return params
+
+    if "video_url" in params_str:
+        url_match = URL_RE.search(params_str)
+        if url_match:
+            logger.info("Fallback: extracted URL %s from parameters", url_match.group(0))
+            return {"video_url": url_match.group(0)}
+    return {}
+
+# Shared worker pool for Gemini generations
+# The pinned SDK has no real batch endpoint, so there is nothing to gain
+# from coalescing prompts; the pool just bounds how many generations are
+# in flight at once without ever serializing them behind each other.
+GEMINI_POOL_WORKERS = 8
+
+_gemini_pool = ThreadPoolExecutor(max_workers=GEMINI_POOL_WORKERS)
+
+def generate_gemini_content(prompt):
+    """Run a Gemini generation on the shared worker pool"""
+    return _gemini_pool.submit(GEMINI_MODEL.generate_content, prompt).result()
+
+# Function to handle agentic LLM calls
+def call_gemini(prompt, conversation_id=None, tool_results=None, system_prompt=None):
+    """
+    Call Gemini API with prompt and handle tool calls
+
+    Args:
+        prompt (str): The user prompt
+        conversation_id (str): ID to track conversation history
         tool_results (dict): Results from previous tool calls
-        
+        system_prompt (str): Static instructions, kept out of the dynamic
+            turn content so the prompt prefix stays stable across calls
+
     Returns:
         dict: Response from Gemini with potential tool calls
     """
     # Log query step
     log_flow_step(conversation_id, "QUERY", prompt)
-    
-    # Get or create conversation history
-    if conversation_id not in conversation_history:
-        conversation_history[conversation_id] = []
-    
+
+    # Serve repeated first-turn prompts from the response cache; ongoing
+    # conversations skip the cache so prior context still shapes the reply
+    cache_key = None
+    if not get_history(conversation_id):
+        cache_key = _gemini_cache_key(prompt, tool_results, system_prompt)
+        cached = _gemini_cache_get(cache_key)
+        if cached is not None:
+            log_flow_step(conversation_id, "RESULT", "Gemini response cache hit")
+            if tool_results:
+                append_history(conversation_id, {
+                    "role": "function",
+                    "parts": [{"text": json_dumps(tool_results)}]
+                })
+            append_history(conversation_id, {
+                "role": "user",
+                "parts": [{"text": prompt}]
+            })
+            append_history(conversation_id, {
+                "role": "assistant",
+                "parts": [{"text": cached["response"]}]
+            })
+            return cached
+
     # Add tool results to history if provided
     if tool_results:
         log_flow_step(conversation_id, "RESULT", str(tool_results))
-        conversation_history[conversation_id].append({
+        append_history(conversation_id, {
             "role": "function",
-            "parts": [{"text": json.dumps(tool_results)}]
+            "parts": [{"text": json_dumps(tool_results)}]
         })
-    
+
     # Add user prompt to history
-    conversation_history[conversation_id].append({
+    append_history(conversation_id, {
         "role": "user",
         "parts": [{"text": prompt}]
     })
-    
+
     try:
-        # Construct full conversation context
-        full_context = ""
-        for message in conversation_history[conversation_id]:
-            role = message["role"]
-            content = message["parts"][0]["text"]
-            full_context += f"{role.upper()}: {content}\n\n"
-        
-        # Add tool descriptions to the prompt
-        tools_description = "You have access to the following tools:\n"
-        for tool_name, tool in available_tools.items():
-            tools_description += f"- {tool_name}: {tool.description}\n"
+        # Construct full conversation context in a single join
+        full_context = "\n\n".join(
+            f"{message['role'].upper()}: {message['parts'][0]['text']}"
+            for message in get_history(conversation_id)
+        )
         
-        full_prompt = f"{tools_description}\n\n{full_context}\n\nIf you need to use a tool, respond with:\nTOOL: <tool_name>\nPARAMS: {{'param1': 'value1', 'param2': 'value2'}}\n\nOtherwise respond directly to the user."
+        # The static prefix (tool descriptions, then the system prompt)
+        # comes before the per-turn context, so it is byte-identical
+        # across calls that share a system prompt
+        prefix = f"{TOOLS_DESCRIPTION}\n\nSYSTEM: {system_prompt}" if system_prompt else TOOLS_DESCRIPTION
+        full_prompt = f"{prefix}\n\n{full_context}\n\nIf you need to use a tool, respond with:\nTOOL: <tool_name>\nPARAMS: {{'param1': 'value1', 'param2': 'value2'}}\n\nOtherwise respond directly to the user."
         
-        # Call Gemini API
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = model.generate_content(full_prompt)
+        # Call Gemini API on the shared worker pool
+        response = generate_gemini_content(full_prompt)
         response_text = response.text
         
         # Log LLM response step
@@ -763,8 +1413,7 @@ def call_gemini(prompt, conversation_id=None, tool_results=None):
         # Check if the response includes a tool call
         if "TOOL:" in response_text:
             # Extract tool name and parameters
-            tool_pattern = r"TOOL: (\w+)\nPARAMS: ({.*})"
-            tool_match = re.search(tool_pattern, response_text, re.DOTALL)
+            tool_match = TOOL_CALL_RE.search(response_text)
             
             if tool_match:
                 tool_name = tool_match.group(1)
@@ -772,113 +1421,449 @@ def call_gemini(prompt, conversation_id=None, tool_results=None):
                 
                 # Log tool call step
                 log_flow_step(conversation_id, "TOOL", f"{tool_name}: {tool_params_str}")
-                
-                try:
-                    # Process tool parameters as before...
-                    # Replace single quotes with double quotes for JSON parsing
-                    tool_params_str = tool_params_str.replace("'", '"')
-                    
-                    # Fix issue with double quotes in URLs - improved pattern to handle more edge cases
-                    # First pattern: Fix cases with ""https" format
-                    tool_params_str = re.sub(r'": ""(https?)"://', r'": "\1://', tool_params_str)
-                    
-                    # Second pattern: Fix cases where URL is surrounded by multiple quotes
-                    tool_params_str = re.sub(r'": "+"(https?://[^"]+)"+"', r'": "\1"', tool_params_str)
-                    
-                    # Third pattern: Fix any remaining URL formatting issues
-                    tool_params_str = re.sub(r'": +"([^"]+)"', r'": "\1"', tool_params_str)
-                    
-                    # Ensure all key names have double quotes
-                    tool_params_str = re.sub(r'(\w+):', r'"\1":', tool_params_str)
-                    
-                    # Log the cleaned parameters for debugging
-                    logger.info(f"Cleaned parameters: {tool_params_str}")
-                    
-                    try:
-                        tool_params = json.loads(tool_params_str)
-                    except json.JSONDecodeError as e:
-                        logger.error(f"JSON parse error: {e}")
-                        # Try a more aggressive cleanup approach for URLs
-                        if "video_url" in tool_params_str:
-                            # Extract the URL using regex
-                            url_match = re.search(r'https?://[^\s"]+', tool_params_str)
-                            if url_match:
-                                url = url_match.group(0)
-                                # Create a clean parameter dictionary
-                                tool_params = {"video_url": url}
-                                logger.info(f"Fallback: extracted URL {url} from parameters")
-                            else:
-                                raise
-                        else:
-                            raise
-                    
+
+                tool_params = _recover_tool_params(tool_params_str)
+
+                if tool_params:
+                    logger.info("Parsed parameters: %s", tool_params)
+
                     # Store the assistant's response
-                    conversation_history[conversation_id].append({
+                    append_history(conversation_id, {
                         "role": "assistant",
                         "parts": [{"text": response_text}]
                     })
-                    
-                    return {
+
+                    result = {
                         "response": response_text,
                         "tool_call": {
                             "name": tool_name,
                             "parameters": tool_params
                         }
                     }
-                except json.JSONDecodeError:
-                    logger.error(f"Failed to parse tool parameters: {tool_params_str}")
+                    if cache_key:
+                        _gemini_cache_set(cache_key, result)
+                    return result
+
+                logger.error("Failed to parse tool parameters: %s", tool_params_str)
         
         # If no tool call, just return the response
-        conversation_history[conversation_id].append({
+        append_history(conversation_id, {
             "role": "assistant",
             "parts": [{"text": response_text}]
         })
         
-        return {
+        result = {
             "response": response_text,
             "tool_call": None
         }
-        
+        if cache_key:
+            _gemini_cache_set(cache_key, result)
+        return result
+
     except Exception as e:
-        logger.error(f"Error calling Gemini API: {e}")
+        logger.error("Error calling Gemini API: %s", e)
+        # The error flag keeps this fallback out of the response caches;
+        # _gemini_cache_set is never reached on this path either
         return {
             "response": f"Error: {str(e)}",
-            "tool_call": None
+            "tool_call": None,
+            "error": True
         }
 
+def call_gemini_stream(prompt, conversation_id=None, tool_results=None, system_prompt=None):
+    """
+    Stream a Gemini reply for a leaf turn, yielding text chunks
+
+    Used for final answers that are forwarded to the client as they are
+    generated, cutting time-to-first-byte from full generation latency to
+    first-token latency. Tool-calling turns still go through call_gemini,
+    since tool detection needs the complete text. The full reply is
+    appended to the conversation history once the stream finishes.
+    """
+    log_flow_step(conversation_id, "QUERY", prompt)
+
+    if tool_results:
+        log_flow_step(conversation_id, "RESULT", str(tool_results))
+        append_history(conversation_id, {
+            "role": "function",
+            "parts": [{"text": json_dumps(tool_results)}]
+        })
+
+    append_history(conversation_id, {
+        "role": "user",
+        "parts": [{"text": prompt}]
+    })
+
+    full_context = "\n\n".join(
+        f"{message['role'].upper()}: {message['parts'][0]['text']}"
+        for message in get_history(conversation_id)
+    )
+    prefix = f"{TOOLS_DESCRIPTION}\n\nSYSTEM: {system_prompt}" if system_prompt else TOOLS_DESCRIPTION
+    full_prompt = f"{prefix}\n\n{full_context}\n\nRespond directly to the user."
+
+    # Streaming calls the model directly rather than going through the
+    # pool: the point here is first-token latency, not bounding load
+    response = GEMINI_MODEL.generate_content(full_prompt, stream=True)
+    pieces = []
+    for chunk in response:
+        if chunk.text:
+            pieces.append(chunk.text)
+            yield chunk.text
+
+    response_text = "".join(pieces)
+    log_flow_step(conversation_id, "LLM", response_text)
+    append_history(conversation_id, {
+        "role": "assistant",
+        "parts": [{"text": response_text}]
+    })
+
+# Tool result cache
+# Repeated tool calls with identical parameters reuse the previous result
+# instead of hitting the YouTube/Gemini APIs again.
+TOOL_CACHE_TTL = 600
+# Per-tool overrides: trending lists stay useful for an hour, while video
+# stats move fast enough that 15 minutes is the safe ceiling
+TOOL_CACHE_TTLS = {
+    "youtube_scraper": 3600,
+    "youtube_scraper_batch": 3600,
+    "performance_tracker": 900,
+}
+
+def _tool_cache_ttl(tool_name):
+    return TOOL_CACHE_TTLS.get(tool_name, TOOL_CACHE_TTL)
+
+# In-process fallback cache: key -> (timestamp, result)
+_tool_result_cache = {}
+
+def _tool_cache_key(tool_call):
+    if orjson is not None:
+        payload = orjson.dumps(tool_call["parameters"], option=orjson.OPT_SORT_KEYS)
+    else:
+        payload = json.dumps(tool_call["parameters"], sort_keys=True).encode()
+    digest = hashlib.sha256(payload).hexdigest()
+    return f"tool:{tool_call['name']}:{digest}"
+
+def get_cached_tool_result(tool_call):
+    """Return the cached result for a tool call, or None on a miss"""
+    key = _tool_cache_key(tool_call)
+    if redis_client is not None:
+        cached = redis_client.get(key)
+        return json_loads(cached) if cached else None
+    entry = _tool_result_cache.get(key)
+    if entry and time.time() - entry[0] < _tool_cache_ttl(tool_call["name"]):
+        return entry[1]
+    return None
+
+def _tool_cache_set(tool_call, result):
+    key = _tool_cache_key(tool_call)
+    if redis_client is not None:
+        redis_client.setex(key, _tool_cache_ttl(tool_call["name"]), json_dumps(result))
+    else:
+        _fallback_cache_put(_tool_result_cache, key, result)
+
 # Function to execute tool calls
 def execute_tool_call(tool_call):
     """
     Execute a tool call and return results
-    
+
     Args:
         tool_call (dict): Tool call details with name and parameters
-        
+
     Returns:
         dict: Results from tool execution
     """
     tool_name = tool_call["name"]
     tool_params = tool_call["parameters"]
-    
-    if tool_name not in available_tools:
+
+    execute = _TOOL_DISPATCH.get(tool_name)
+    if execute is None:
         log_flow_step(GLOBAL_TOOL_SESSION, "ERROR", f"Tool '{tool_name}' not found")
         return {"error": f"Tool '{tool_name}' not found"}
-    
+
+    cached = get_cached_tool_result(tool_call)
+    if cached is not None:
+        log_flow_step(GLOBAL_TOOL_SESSION, "RESULT", f"Cache hit for tool '{tool_name}'")
+        return cached
+
     try:
-        tool = available_tools[tool_name]
-        result = tool.execute(**tool_params)
+        result = execute(**tool_params)
+        # Don't pin failures: mock fallbacks and tool errors stay out of
+        # the cache so the next request retries the real API
+        if "error" not in result and not result.get("mock"):
+            _tool_cache_set(tool_call, {tool_name: result})
         return {tool_name: result}
     except Exception as e:
         log_flow_step(GLOBAL_TOOL_SESSION, "ERROR", f"Error executing tool {tool_name}: {e}")
-        logger.error(f"Error executing tool {tool_name}: {e}")
+        logger.error("Error executing tool %s: %s", tool_name, e)
         return {"error": f"Tool execution error: {str(e)}"}
 
+# System prompts for the endpoints' Gemini calls, hoisted to module scope:
+# only the niche/topic text varies per request, so the invariant bodies are
+# built once instead of re-assembled as f-strings on every call
+TRENDING_SYSTEM_PROMPT = """
+        You're analyzing YouTube trends in the '{niche}' niche.
+        Based on the trending videos and their metrics, provide:
+        1. Common patterns in successful titles
+        2. Key topics that seem to be popular
+        3. A brief summary of what content performs well
+        Keep it concise and actionable for content creators.
+        """
+
+CONTENT_SYSTEM_PROMPT = """
+        You're an expert YouTube content strategist creating a detailed content plan for a video about: '{prompt}'.
+
+        Review the video ideas, thumbnail concepts, and script template I'm providing you. Then, create a comprehensive,
+        highly specific response with these sections:
+
+        1. CONTENT STRATEGY
+        - Analyze which video idea has the highest potential and explain exactly why
+        - Suggest 2-3 specific ways to make the title and hook even more compelling
+        - Identify the most important points to emphasize based on current trends
+
+        2. SCRIPT ENHANCEMENT
+        - Provide specific talking points for the introduction that will hook viewers
+        - Suggest 2-3 storytelling techniques that would work well for this topic
+        - Recommend visual elements or demonstrations to include at specific timestamps
+
+        3. THUMBNAIL OPTIMIZATION
+        - Select the best thumbnail idea and explain why it will generate the highest CTR
+        - Suggest specific colors, fonts, and composition for maximum impact
+        - Recommend a specific emotion to convey in the thumbnail and how to achieve it
+
+        4. DISTRIBUTION STRATEGY
+        - Recommend specific hashtags for this topic
+        - Suggest the best posting time and promotional approach
+        - Identify 2-3 related content pieces to create as follow-ups
+
+        Your advice should be extremely specific to '{prompt}' and actionable. Include exact phrases, examples,
+        and techniques that would work well for this particular topic.
+        """
+
+PERFORMANCE_SYSTEM_PROMPT = """
+        You're analyzing YouTube video performance metrics.
+        Based on the data provided, give specific actionable advice to improve:
+        1. Viewer retention
+        2. Engagement (likes, comments)
+        3. Overall performance
+        Keep your recommendations practical and specific to this video.
+        """
+
+@lru_cache(maxsize=4096)
+def _format_count(count):
+    """Format a raw count for display (e.g. 1.2M, 45.0K)"""
+    if count >= 1000000:
+        return f"{count/1000000:.1f}M"
+    if count >= 1000:
+        return f"{count/1000:.1f}K"
+    return str(count)
+
+def _format_count_fields(video, fields=('views', 'likes')):
+    """Attach <field>_formatted display strings to a video dict in place"""
+    for field in fields:
+        # int() handles both the API's digit strings and raw ints in one
+        # parse; mock placeholders like "1.2M" just skip formatting
+        try:
+            count = int(video.get(field, ''))
+        except (TypeError, ValueError):
+            continue
+        video[f"{field}_formatted"] = _format_count(count)
+
+def _video_cache_value(video_id, deep, video_data):
+    """Stable serialization of an analyze_video request for cache keying"""
+    if orjson is not None:
+        return orjson.dumps([video_id, deep, video_data],
+                            option=orjson.OPT_SORT_KEYS).decode()
+    return json.dumps([video_id, deep, video_data], sort_keys=True)
+
+# Upper bound on videos fed into the per-video analysis loop
+MAX_TRENDING = int(os.getenv("MAX_TRENDING", "25"))
+
+# The trending summary prompt only needs enough material for Gemini to
+# spot patterns; cap the video count and strip fields (thumbnails, full
+# descriptions, per-keyword densities) that would burn tokens for nothing
+MAX_PROMPT_VIDEOS = 10
+
+def _slim_analysis_results(analysis_results, limit=MAX_PROMPT_VIDEOS):
+    """Reduce analysis results to the top-viewed videos' prompt-relevant fields"""
+    def views(result):
+        try:
+            return int(result["video"].get("views", 0) or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    top = analysis_results
+    if len(top) > limit:
+        top = sorted(top, key=views, reverse=True)[:limit]
+    return [{
+        "title": result["video"].get("title"),
+        "channel": result["video"].get("channel"),
+        "views": result["video"].get("views"),
+        "likes": result["video"].get("likes"),
+        "keywords": result["video"].get("keywords", [])[:5],
+        "description": (result["video"].get("description") or '')[:500],
+        "analysis": {
+            "seo_score": result["analysis"].get("seo_score"),
+            "top_keywords": result["analysis"].get("top_keywords"),
+            "improvement_suggestions": result["analysis"].get("improvement_suggestions"),
+        },
+    } for result in top]
+
+# Endpoint response cache
+# Duplicate requests (same niche, prompt, or video URL) within the TTL
+# return the previous payload instead of re-running a multi-call Gemini
+# flow; like the other caches this is Redis-backed when available.
+ENDPOINT_CACHE_TTL = 600
+# Expired trending payloads may still be served for this long while a
+# background refresh recomputes them (stale-while-revalidate)
+ENDPOINT_STALE_TTL = 3600
+_endpoint_response_cache = {}
+
+def _endpoint_cache_key(endpoint, value):
+    digest = hashlib.sha256(value.encode()).hexdigest()
+    return f"resp:{endpoint}:{digest}"
+
+def _endpoint_cache_entry(endpoint, value):
+    """Return (payload, age in seconds) for a cached payload, or None"""
+    key = _endpoint_cache_key(endpoint, value)
+    if redis_client is not None:
+        cached = redis_client.get(key)
+        if not cached:
+            return None
+        entry = json_loads(cached)
+        return entry["p"], time.time() - entry["t"]
+    entry = _endpoint_response_cache.get(key)
+    if entry and time.time() - entry[0] < ENDPOINT_STALE_TTL:
+        return entry[1], time.time() - entry[0]
+    return None
+
+def get_cached_endpoint_response(endpoint, value):
+    """Return a fresh cached endpoint payload, or None on a miss"""
+    entry = _endpoint_cache_entry(endpoint, value)
+    if entry is not None and entry[1] < ENDPOINT_CACHE_TTL:
+        return entry[0]
+    return None
+
+def _gemini_failed(response):
+    """True when a call_gemini result is its error fallback"""
+    return isinstance(response, dict) and response.get("error") is True
+
+def _cached_response(payload):
+    """Build a cache-hit response, flagged in both body and header"""
+    response = jsonify({**payload, "cached": True})
+    response.headers["X-Cache"] = "HIT"
+    return response
+
+def _endpoint_cache_set(endpoint, value, payload):
+    key = _endpoint_cache_key(endpoint, value)
+    if redis_client is not None:
+        # Keep expired-but-usable entries around for the stale window;
+        # the stored timestamp decides actual freshness
+        redis_client.setex(key, ENDPOINT_STALE_TTL,
+                           json_dumps({"t": time.time(), "p": payload}))
+    else:
+        _fallback_cache_put(_endpoint_response_cache, key, payload)
+
+def _build_trending_payload(niche, session_id):
+    """
+    Run the full scrape/analyze/summarize pipeline for a niche
+
+    Returns the response payload (also written to the endpoint cache), or
+    None when no trending videos could be fetched.
+    """
+    # Initialize the flow for this session
+    _reset_flow(session_id)
+
+    # Log initial query
+    log_flow_step(session_id, "QUERY", f"Analyze trending videos for: {niche}")
+
+    # Use the YouTube scraper tool
+    log_flow_step(session_id, "TOOL", f"youtube_scraper(niche={niche})")
+    trending_data = _YT_SCRAPER.execute(niche=niche)
+    log_flow_step(session_id, "RESULT", f"Found {len(trending_data.get('trending_videos', []))} videos")
+
+    if not trending_data or "trending_videos" not in trending_data:
+        return None
+
+    # Bound the working set: a scraper returning far more videos than
+    # expected would otherwise balloon the analysis loop and the prompt
+    trending_data["trending_videos"] = trending_data["trending_videos"][:MAX_TRENDING]
+
+    # Use the content analyzer tool to analyze the trending videos
+    analysis_results = []
+
+    for idx, video in enumerate(trending_data["trending_videos"]):
+        # Format numbers for display
+        _format_count_fields(video)
+
+        # Analyze each video
+        log_flow_step(session_id, "TOOL", f"content_analyzer({video.get('title', '')[:30]}...)")
+        analysis = _CONTENT_ANALYZER.execute(video)
+        log_flow_step(session_id, "RESULT", f"SEO score: {analysis.get('seo_score', 'N/A')}")
+
+        # Combine video data with analysis
+        combined_result = {
+            "video": video,
+            "analysis": analysis
+        }
+
+        analysis_results.append(combined_result)
+
+    # Generate summary with Gemini
+    system_prompt = TRENDING_SYSTEM_PROMPT.format(niche=niche)
+
+    user_prompt = json_dumps(_slim_analysis_results(analysis_results))
+
+    # Call Gemini for insights
+    log_flow_step(session_id, "QUERY", "Generate summary from analysis")
+    ai_summary = call_gemini(
+        prompt=user_prompt,
+        conversation_id=session_id,
+        system_prompt=system_prompt
+    )
+
+    log_flow_step(session_id, "RESULT", "Analysis complete")
+
+    payload = {
+        "success": True,
+        "niche": niche,
+        "trending_videos": trending_data["trending_videos"],
+        "analysis_results": analysis_results,
+        "ai_summary": ai_summary
+    }
+    # Don't pin a transient failure for the cache (and stale) TTL,
+    # whether a Gemini error or the scraper's mock fallback
+    if not _gemini_failed(ai_summary) and not trending_data.get("mock"):
+        _endpoint_cache_set("trending", niche.lower().strip(), payload)
+    return payload
+
+# Niche keys with a background refresh already running
+_trending_refresh_inflight = set()
+_trending_refresh_lock = threading.Lock()
+
+def _start_trending_refresh(niche, niche_key):
+    """Recompute a stale trending payload in the background, once per key"""
+    with _trending_refresh_lock:
+        if niche_key in _trending_refresh_inflight:
+            return
+        _trending_refresh_inflight.add(niche_key)
+
+    def refresh():
+        try:
+            _build_trending_payload(niche, f"refresh_{niche_key}")
+        except Exception as e:
+            logger.error("Background trending refresh failed for %s: %s", niche, e)
+        finally:
+            with _trending_refresh_lock:
+                _trending_refresh_inflight.discard(niche_key)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
 # API routes
 @app.route('/analyze_trending', methods=['POST'])
 def analyze_trending():
     """
     Analyze trending videos in a specific niche
-    
+
     Request:
     {
         "niche": "string",  // Required: the niche/keyword to analyze
@@ -886,107 +1871,97 @@ def analyze_trending():
     }
     """
     data = request.json
-    
+
     if not data or "niche" not in data:
         return jsonify({"error": "Missing required parameter: niche"}), 400
-    
+
     niche = data["niche"]
     session_id = data.get("session_id", "default")
-    
+
+    # Serve repeated niches from the response cache; stale entries are
+    # returned immediately while a background thread rebuilds them
+    niche_key = niche.lower().strip()
+    entry = _endpoint_cache_entry("trending", niche_key)
+    if entry is not None:
+        payload, age = entry
+        if age < ENDPOINT_CACHE_TTL:
+            return _cached_response(payload)
+        _start_trending_refresh(niche, niche_key)
+        response = _cached_response(payload)
+        response.headers["X-Cache"] = "STALE"
+        return response
+
     try:
-        # Initialize the flow for this session
-        flow_steps[session_id] = 1
-        
-        # Log initial query
-        log_flow_step(session_id, "QUERY", f"Analyze trending videos for: {niche}")
-        
-        # Use the YouTube scraper tool
-        yt_scraper = available_tools["youtube_scraper"]
-        log_flow_step(session_id, "TOOL", f"youtube_scraper(niche={niche})")
-        trending_data = yt_scraper.execute(niche=niche)
-        log_flow_step(session_id, "RESULT", f"Found {len(trending_data.get('trending_videos', []))} videos")
-        
-        if not trending_data or "trending_videos" not in trending_data:
+        payload = _build_trending_payload(niche, session_id)
+
+        if payload is None:
             return jsonify({
                 "error": "Failed to fetch trending videos",
                 "message": "Could not retrieve trending videos for the specified niche"
             }), 500
-        
-        # Use the content analyzer tool to analyze the trending videos
-        content_analyzer = available_tools["content_analyzer"]
-        analysis_results = []
-        
-        for idx, video in enumerate(trending_data["trending_videos"]):
-            # Format numbers for display
-            if 'views' in video and video['views'].isdigit():
-                view_count = int(video['views'])
-                if view_count >= 1000000:
-                    video['views_formatted'] = f"{view_count/1000000:.1f}M"
-                elif view_count >= 1000:
-                    video['views_formatted'] = f"{view_count/1000:.1f}K"
-                else:
-                    video['views_formatted'] = str(view_count)
-            
-            if 'likes' in video and video['likes'].isdigit():
-                like_count = int(video['likes'])
-                if like_count >= 1000000:
-                    video['likes_formatted'] = f"{like_count/1000000:.1f}M"
-                elif like_count >= 1000:
-                    video['likes_formatted'] = f"{like_count/1000:.1f}K"
-                else:
-                    video['likes_formatted'] = str(like_count)
-            
-            # Analyze each video
-            log_flow_step(session_id, "TOOL", f"content_analyzer({video.get('title', '')[:30]}...)")
-            analysis = content_analyzer.execute(video)
-            log_flow_step(session_id, "RESULT", f"SEO score: {analysis.get('seo_score', 'N/A')}")
-            
-            # Combine video data with analysis
-            combined_result = {
-                "video": video,
-                "analysis": analysis
-            }
-            
-            analysis_results.append(combined_result)
-        
-        # Generate summary with Gemini
-        system_prompt = f"""
-        You're analyzing YouTube trends in the '{niche}' niche.
-        Based on the trending videos and their metrics, provide:
-        1. Common patterns in successful titles
-        2. Key topics that seem to be popular
-        3. A brief summary of what content performs well
-        Keep it concise and actionable for content creators.
-        """
-        
-        user_prompt = json.dumps(analysis_results, indent=2)
-        
-        # Call Gemini for insights
-        log_flow_step(session_id, "QUERY", "Generate summary from analysis")
-        ai_summary = call_gemini(
-            prompt=user_prompt,
-            conversation_id=session_id,
-            tool_results={"system_prompt": system_prompt}
-        )
-        
-        log_flow_step(session_id, "RESULT", "Analysis complete")
-        
-        return jsonify({
-            "success": True,
-            "niche": niche,
-            "trending_videos": trending_data["trending_videos"],
-            "analysis_results": analysis_results,
-            "ai_summary": ai_summary
-        })
-    
+
+        return jsonify(payload)
+
     except Exception as e:
         log_flow_step(session_id, "ERROR", str(e))
-        logger.error(f"Error in /analyze_trending: {str(e)}")
+        logger.error("Error in /analyze_trending: %s", e)
         return jsonify({
             "error": "Analysis failed",
             "message": str(e)
         }), 500
 
+@app.route('/analyze_trending_stream', methods=['POST'])
+def analyze_trending_stream():
+    """
+    Streamed variant of /analyze_trending
+
+    Emits SSE events per phase — the scraped videos as soon as they
+    arrive, then the per-video analysis, then the Gemini summary token by
+    token — so the extension can render progressively instead of waiting
+    for the whole pipeline.
+    """
+    data = request.json
+
+    if not data or "niche" not in data:
+        return jsonify({"error": "Missing required parameter: niche"}), 400
+
+    niche = data["niche"]
+    session_id = data.get("session_id", "default")
+
+    def generate():
+        try:
+            _reset_flow(session_id)
+            log_flow_step(session_id, "QUERY", f"Analyze trending videos (streamed) for: {niche}")
+
+            trending_data = _YT_SCRAPER.execute(niche=niche)
+            if not trending_data or "trending_videos" not in trending_data:
+                yield f"data: {json_dumps({'error': 'Failed to fetch trending videos'})}\n\n"
+                return
+
+            videos = trending_data["trending_videos"][:MAX_TRENDING]
+            for video in videos:
+                _format_count_fields(video)
+            yield f"data: {json_dumps({'phase': 'trending', 'trending_videos': videos})}\n\n"
+
+            analysis_results = [{"video": video, "analysis": _CONTENT_ANALYZER.execute(video)}
+                                for video in videos]
+            yield f"data: {json_dumps({'phase': 'analysis', 'analysis_results': analysis_results})}\n\n"
+
+            system_prompt = TRENDING_SYSTEM_PROMPT.format(niche=niche)
+            user_prompt = json_dumps(_slim_analysis_results(analysis_results))
+            log_flow_step(session_id, "QUERY", "Generate summary from analysis (streamed)")
+            for chunk in call_gemini_stream(user_prompt, session_id, system_prompt=system_prompt):
+                yield f"data: {json_dumps({'phase': 'summary', 'text': chunk})}\n\n"
+
+            log_flow_step(session_id, "RESULT", "Streamed analysis complete")
+            yield f"data: {json_dumps({'done': True, 'niche': niche})}\n\n"
+        except Exception as e:
+            log_flow_step(session_id, "ERROR", str(e))
+            logger.error("Error in /analyze_trending_stream: %s", e)
+            yield f"data: {json_dumps({'error': str(e)})}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+
 @app.route('/generate_content', methods=['POST'])
 def generate_content():
     """
@@ -1005,18 +1980,22 @@ def generate_content():
     
     prompt = data["prompt"]
     session_id = data.get("session_id", "default")
-    
+
+    # Serve repeated prompts straight from the response cache
+    cached = get_cached_endpoint_response("content", prompt.lower().strip())
+    if cached is not None:
+        return _cached_response(cached)
+
     try:
         # Initialize flow for this session
-        flow_steps[session_id] = 1
+        _reset_flow(session_id)
         
         # Log initial query
         log_flow_step(session_id, "QUERY", f"Generate content for: {prompt}")
         
         # Use the content generator tool
         log_flow_step(session_id, "TOOL", f"content_generator(prompt={prompt})")
-        content_generator = available_tools["content_generator"]
-        content_ideas = content_generator.execute(prompt=prompt)
+        content_ideas = _CONTENT_GENERATOR.execute(prompt=prompt)
         log_flow_step(session_id, "RESULT", f"Generated {len(content_ideas.get('video_ideas', []))} ideas")
         
         if not content_ideas:
@@ -1026,58 +2005,33 @@ def generate_content():
             }), 500
         
         # Generate insights with Gemini
-        system_prompt = f"""
-        You're an expert YouTube content strategist creating a detailed content plan for a video about: '{prompt}'.
-        
-        Review the video ideas, thumbnail concepts, and script template I'm providing you. Then, create a comprehensive,
-        highly specific response with these sections:
-        
-        1. CONTENT STRATEGY
-        - Analyze which video idea has the highest potential and explain exactly why
-        - Suggest 2-3 specific ways to make the title and hook even more compelling
-        - Identify the most important points to emphasize based on current trends
-        
-        2. SCRIPT ENHANCEMENT
-        - Provide specific talking points for the introduction that will hook viewers
-        - Suggest 2-3 storytelling techniques that would work well for this topic
-        - Recommend visual elements or demonstrations to include at specific timestamps
-        
-        3. THUMBNAIL OPTIMIZATION
-        - Select the best thumbnail idea and explain why it will generate the highest CTR
-        - Suggest specific colors, fonts, and composition for maximum impact
-        - Recommend a specific emotion to convey in the thumbnail and how to achieve it
-        
-        4. DISTRIBUTION STRATEGY
-        - Recommend specific hashtags for this topic
-        - Suggest the best posting time and promotional approach
-        - Identify 2-3 related content pieces to create as follow-ups
-        
-        Your advice should be extremely specific to '{prompt}' and actionable. Include exact phrases, examples, 
-        and techniques that would work well for this particular topic.
-        """
-        
-        user_prompt = json.dumps(content_ideas, indent=2)
+        system_prompt = CONTENT_SYSTEM_PROMPT.format(prompt=prompt)
+
+        user_prompt = json_dumps(content_ideas)
         
         # Call Gemini for insights
         log_flow_step(session_id, "QUERY", "Generate content strategy")
         ai_insights = call_gemini(
             prompt=user_prompt,
             conversation_id=session_id,
-            tool_results={"system_prompt": system_prompt}
+            system_prompt=system_prompt
         )
         
         log_flow_step(session_id, "RESULT", "Content generation complete")
         
-        return jsonify({
+        payload = {
             "success": True,
             "prompt": prompt,
             "content_ideas": content_ideas,
             "ai_insights": ai_insights
-        })
+        }
+        if not _gemini_failed(ai_insights) and not content_ideas.get("mock"):
+            _endpoint_cache_set("content", prompt.lower().strip(), payload)
+        return jsonify(payload)
     
     except Exception as e:
         log_flow_step(session_id, "ERROR", str(e))
-        logger.error(f"Error in /generate_content: {str(e)}")
+        logger.error("Error in /generate_content: %s", e)
         return jsonify({
             "error": "Content generation failed",
             "message": str(e)
@@ -1102,24 +2056,32 @@ def track_performance():
     video_url = data["video_url"]
     session_id = data.get("session_id", "default")
     
-    # Check if the URL is a valid YouTube URL
-    if "youtube.com" not in video_url and "youtu.be" not in video_url:
+    # Check if the URL is a valid YouTube URL; the old substring test
+    # accepted any string that merely mentioned youtube.com. The match
+    # also captures the video ID so the tracker needn't re-parse it.
+    url_match = YT_URL_RE.match(video_url.strip())
+    if not url_match:
         return jsonify({
             "error": "Invalid YouTube URL",
             "message": "Please provide a valid YouTube video URL"
         }), 400
-    
+
+    # Serve repeated URLs straight from the response cache
+    cached = get_cached_endpoint_response("performance", video_url.strip())
+    if cached is not None:
+        return _cached_response(cached)
+
     try:
         # Initialize flow for this session
-        flow_steps[session_id] = 1
+        _reset_flow(session_id)
         
         # Log initial query
         log_flow_step(session_id, "QUERY", f"Track performance for: {video_url}")
         
         # Use the performance tracker tool
         log_flow_step(session_id, "TOOL", f"performance_tracker(video_url={video_url})")
-        performance_tracker = available_tools["performance_tracker"]
-        performance_data = performance_tracker.execute(video_url=video_url)
+        performance_data = _PERFORMANCE_TRACKER.execute(video_url=video_url,
+                                                         video_id=url_match.group(1))
         
         if "error" in performance_data:
             log_flow_step(session_id, "ERROR", performance_data["error"])
@@ -1131,37 +2093,33 @@ def track_performance():
         log_flow_step(session_id, "RESULT", "Performance data retrieved")
         
         # Generate insights with Gemini
-        system_prompt = """
-        You're analyzing YouTube video performance metrics.
-        Based on the data provided, give specific actionable advice to improve:
-        1. Viewer retention
-        2. Engagement (likes, comments)
-        3. Overall performance
-        Keep your recommendations practical and specific to this video.
-        """
-        
-        user_prompt = json.dumps(performance_data, indent=2)
+        system_prompt = PERFORMANCE_SYSTEM_PROMPT
+
+        user_prompt = json_dumps(performance_data)
         
         # Call Gemini for insights
         log_flow_step(session_id, "QUERY", "Generate performance insights")
         ai_insights = call_gemini(
             prompt=user_prompt,
             conversation_id=session_id,
-            tool_results={"system_prompt": system_prompt}
+            system_prompt=system_prompt
         )
         
         log_flow_step(session_id, "RESULT", "Performance analysis complete")
         
-        return jsonify({
+        payload = {
             "success": True,
             "video_url": video_url,
             "performance_data": performance_data,
             "ai_insights": ai_insights
-        })
+        }
+        if not _gemini_failed(ai_insights) and not performance_data.get("mock"):
+            _endpoint_cache_set("performance", video_url.strip(), payload)
+        return jsonify(payload)
     
     except Exception as e:
         log_flow_step(session_id, "ERROR", str(e))
-        logger.error(f"Error in /track_performance: {str(e)}")
+        logger.error("Error in /track_performance: %s", e)
         return jsonify({
             "error": "Performance tracking failed",
             "message": str(e)
@@ -1173,26 +2131,72 @@ def analyze_video():
         data = request.json
         video_id = data.get('video_id', '')
         video_data = data.get('video_data', {})
-        
-        # Generate a conversation ID
-        conversation_id = f"video_{int(time.time())}"
-        
+
+        if not video_id:
+            return jsonify({"error": "Missing required parameter: video_id"}), 400
+
+        # Reopening a recently analyzed video returns the previous result
+        # instead of re-running the multi-turn Gemini chain
+        cache_value = _video_cache_value(video_id, bool(data.get('deep')), video_data)
+        cached = get_cached_endpoint_response("video", cache_value)
+        if cached is not None:
+            return _cached_response(cached)
+
+        # Generate a collision-free conversation ID
+        conversation_id = f"video_{token_hex(8)}"
+
+        def finish(response):
+            payload = {
+                "result": response["response"],
+                "video_id": video_id,
+                "conversation_id": conversation_id
+            }
+            if not _gemini_failed(response):
+                _endpoint_cache_set("video", cache_value, payload)
+            return jsonify(payload)
+
         # Initialize flow for this session
-        flow_steps[conversation_id] = 1
-        
+        _reset_flow(conversation_id)
+
         # Log initial query
         log_flow_step(conversation_id, "QUERY", f"Analyze video ID: {video_id}")
-        
+
+        # With almost no metadata the three-call agent chain has nothing
+        # to dig into; answer in one Gemini turn instead of burning three
+        # round trips. Callers can force the full chain with "deep": true.
+        if len(video_data) < 3 and not data.get('deep'):
+            quick_prompt = f"Give concise insights and improvement suggestions for the YouTube video with ID {video_id}. Known data: {json_dumps(video_data)}."
+            response = call_gemini(quick_prompt, conversation_id)
+            log_flow_step(conversation_id, "RESULT", "Quick flow complete (Query→LLM→Result)")
+            return finish(response)
+
         # Initial prompt to the model
-        prompt = f"I want to analyze this YouTube video with ID {video_id} and the following data: {json.dumps(video_data)}. What insights can you provide about this video's performance, SEO, and content quality?"
+        prompt = f"I want to analyze this YouTube video with ID {video_id} and the following data: {json_dumps(video_data)}. What insights can you provide about this video's performance, SEO, and content quality?"
         
         # First call to Gemini
         response = call_gemini(prompt, conversation_id)
         
         # Check if there's a tool call
         if response.get("tool_call"):
-            # Execute the tool
             tool_name = response["tool_call"]["name"]
+
+            # If the tool result is still warm in the cache, skip the
+            # intermediate Gemini round trip and ask for final
+            # recommendations directly
+            cached_results = get_cached_tool_result(response["tool_call"])
+            if cached_results is not None:
+                log_flow_step(conversation_id, "RESULT", f"Cached tool results for {tool_name}")
+                final_prompt = "Based on all the analysis, what are your final recommendations for improving this video and creating better content in the future?"
+                log_flow_step(conversation_id, "QUERY", "Request final recommendations")
+                final_response = call_gemini(
+                    final_prompt,
+                    conversation_id,
+                    cached_results
+                )
+                log_flow_step(conversation_id, "RESULT", "Short-circuited flow complete (Query→LLM→CachedTool→Query→LLM→Result)")
+                return finish(final_response)
+
+            # Execute the tool
             log_flow_step(conversation_id, "TOOL", f"{tool_name}")
             tool_results = execute_tool_call(response["tool_call"])
             log_flow_step(conversation_id, "RESULT", f"Tool results from {tool_name}")
@@ -1225,30 +2229,68 @@ def analyze_video():
                 
                 log_flow_step(conversation_id, "RESULT", "Full agentic flow complete (Query→LLM→Tool→Result→Query→LLM→Tool→Result→Query→LLM→Result)")
                 
-                return jsonify({
-                    "result": final_response["response"],
-                    "video_id": video_id,
-                    "conversation_id": conversation_id
-                })
+                return finish(final_response)
             else:
                 log_flow_step(conversation_id, "RESULT", "Partial agentic flow complete (Query→LLM→Tool→Result→Query→LLM→Result)")
-                return jsonify({
-                    "result": second_response["response"],
-                    "video_id": video_id,
-                    "conversation_id": conversation_id
-                })
+                return finish(second_response)
         else:
             log_flow_step(conversation_id, "RESULT", "Simple flow complete (Query→LLM→Result)")
-            return jsonify({
-                "result": response["response"],
-                "video_id": video_id,
-                "conversation_id": conversation_id
-            })
+            return finish(response)
             
     except Exception as e:
         log_flow_step(conversation_id if 'conversation_id' in locals() else "unknown", "ERROR", str(e))
-        logger.error(f"Error in analyze_video: {e}")
+        logger.error("Error in analyze_video: %s", e)
         return jsonify({"error": str(e)}), 500
 
+@app.route('/analyze_video_stream', methods=['POST'])
+def analyze_video_stream():
+    """
+    Streaming variant of analyze_video
+
+    Runs the same agent flow, but the final recommendations are sent over
+    Server-Sent Events as Gemini generates them, so the client renders
+    text at first-token latency instead of waiting out the whole reply.
+    """
+    data = request.json
+
+    if not data or not data.get('video_id'):
+        return jsonify({"error": "Missing required parameter: video_id"}), 400
+
+    video_id = data['video_id']
+    video_data = data.get('video_data', {})
+
+    conversation_id = f"video_{token_hex(8)}"
+    log_flow_step(conversation_id, "QUERY", f"Analyze video ID: {video_id} (stream)")
+
+    prompt = f"I want to analyze this YouTube video with ID {video_id} and the following data: {json_dumps(video_data)}. What insights can you provide about this video's performance, SEO, and content quality?"
+
+    def generate():
+        try:
+            response = call_gemini(prompt, conversation_id)
+
+            if response.get("tool_call"):
+                tool_name = response["tool_call"]["name"]
+                log_flow_step(conversation_id, "TOOL", f"{tool_name}")
+                tool_results = execute_tool_call(response["tool_call"])
+                log_flow_step(conversation_id, "RESULT", f"Tool results from {tool_name}")
+
+                final_prompt = "Based on the video analysis, what specific improvements would you recommend for this video? How can the title, description, and content be optimized?"
+                for chunk in call_gemini_stream(final_prompt, conversation_id, tool_results):
+                    yield f"data: {json_dumps({'text': chunk})}\n\n"
+            else:
+                # Model answered without a tool; emit the reply as one event
+                yield f"data: {json_dumps({'text': response['response']})}\n\n"
+
+            yield f"data: {json_dumps({'done': True, 'video_id': video_id, 'conversation_id': conversation_id})}\n\n"
+        except Exception as e:
+            logger.error("Error in analyze_video_stream: %s", e)
+            yield f"data: {json_dumps({'error': str(e)})}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000) 
\ No newline at end of file
+    # Development server only; production runs under gunicorn via wsgi.py.
+    # threaded=True lets the dev server overlap requests while one of them
+    # is blocked on a Gemini or YouTube round trip
+    debug = os.getenv("FLASK_DEBUG", "1") == "1"
+    app.run(debug=debug, port=int(os.getenv("PORT", "5000")), threaded=True) 
\ No newline at end of file
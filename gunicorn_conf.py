@@ -0,0 +1,22 @@
+import os
+
+# Gunicorn configuration for the YouTube Content Analyzer backend.
+# gevent workers let each worker multiplex many in-flight requests while
+# they wait on Gemini / YouTube I/O, instead of blocking a thread per call.
+# Run with: gunicorn -c gunicorn_conf.py wsgi:app
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = "gevent"
+workers = (os.cpu_count() or 1) * 2 + 1
+worker_connections = 1000
+timeout = 120
+
+
+def post_fork(server, worker):
+    # The Gemini SDK talks gRPC, and gRPC's C core does not yield to
+    # gevent's event loop on its own — without this shim every Gemini
+    # call would block the whole worker (all its greenlets) for the
+    # duration of the call. Must run before any gRPC channel is created,
+    # i.e. before the app module is imported in the worker.
+    import grpc.experimental.gevent as grpc_gevent
+    grpc_gevent.init_gevent()